@@ -1,17 +1,22 @@
+import os
 import re
+import mmap
 
-# Read your source text file (replace with the actual file path)
-with open('protonvpn_source.txt', 'r') as f:
-    text = f.read()
+# Server codes in format XX#N (bytes pattern so the file never needs decoding)
+SERVER_CODE = re.compile(rb'\b[A-Z]{2}#\d+')
 
-# Find all server codes in format XX#N
-server_codes = re.findall(r'\b[A-Z]{2}#[\d]+', text)
-
-# Sort alphabetically by country code then number
-server_codes.sort()
+# Map your source text file (replace with the actual file path) and stream matches
+with open('protonvpn_source.txt', 'rb') as f:
+    # mmap refuses empty files; an empty source simply has no codes
+    if os.fstat(f.fileno()).st_size == 0:
+        server_codes = []
+    else:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # Dedupe, then sort alphabetically by country code then number
+            server_codes = sorted({m.group(0) for m in SERVER_CODE.finditer(mm)})
 
 # Save to new file
-with open('protonvpn_complete.txt', 'w') as f:
-    f.write('\n'.join(sorted(server_codes)))
+with open('protonvpn_complete.txt', 'wb') as f:
+    f.write(b'\n'.join(server_codes))
 
-print(f"Extracted {len(server_codes)} server codes")
\ No newline at end of file
+print(f"Extracted {len(server_codes)} server codes")
@@ -5,16 +5,28 @@ Manages two server lists, rotates connections on a timer.
 Control via system signals or command file.
 """
 
+import errno
+import io
 import os
 import sys
+import select
 import time
 import signal
 import json
+import queue
 import threading
+import traceback
 from pathlib import Path
 from subprocess import run, PIPE, CalledProcessError
+from contextlib import redirect_stdout, redirect_stderr
 from datetime import datetime, timedelta
 
+# Optional: faster config encoding
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # --- Configuration Paths ---
 CONFIG_DIR = Path.home() / ".config" / "pvpn-rotator"
 CONFIG_FILE = CONFIG_DIR / "config.json"
@@ -23,6 +35,14 @@ LIST_B_FILE = CONFIG_DIR / "list_b.txt"
 CONTROL_FILE = CONFIG_DIR / "control.fifo"  # Named pipe for commands
 PID_FILE = CONFIG_DIR / "daemon.pid"
 LOG_FILE = CONFIG_DIR / "daemon.log"
+LOG_FLUSH_SECONDS = 30  # Upper bound on how long log lines sit in the buffer
+LOG_QUEUE_SIZE = 2048  # Lines beyond this are dropped rather than blocking the daemon
+LOG_BATCH_SIZE = 64
+LOG_BUFFER_BYTES = 8192  # Encoded log bytes held before a write() is issued
+LOG_CLOSE_TIMEOUT = 5  # Seconds shutdown waits on the log worker
+LIST_CACHE_SIZE = 4  # Parsed list versions kept by the daemon
+CONFIG_SAVE_SECONDS = 1.0  # Minimum gap between config writes from the daemon
+PAUSE_LOG_SECONDS = 30  # How often the daemon logs that it is still paused
 
 # Default configuration
 DEFAULT_CONFIG = {
@@ -34,77 +54,168 @@ DEFAULT_CONFIG = {
 }
 
 # --- Configuration Management ---
+def create_exclusive(path, data, mode=0o644):
+    """Atomically creates path with data. Returns False if it already existed."""
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, mode)
+    except FileExistsError:
+        return False
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+    return True
+
 def load_config():
     CONFIG_DIR.mkdir(parents=True, exist_ok=True)
-    if not CONFIG_FILE.exists():
-        save_config(DEFAULT_CONFIG)
+    # O_EXCL so two daemons starting at once can't both initialise the files
+    if create_exclusive(CONFIG_FILE, encode_config(DEFAULT_CONFIG), 0o600):
         # Create example list files if they don't exist
-        if not LIST_A_FILE.exists():
-            LIST_A_FILE.write_text("US-FREE#1\nCA#5\nNL-FREE#1\n")
-        if not LIST_B_FILE.exists():
-            LIST_B_FILE.write_text("JP#3\nSG#5\nHK#2\n")
+        create_exclusive(LIST_A_FILE, b"US-FREE#1\nCA#5\nNL-FREE#1\n")
+        create_exclusive(LIST_B_FILE, b"JP#3\nSG#5\nHK#2\n")
     try:
         with open(CONFIG_FILE, 'r') as f:
             return json.load(f)
     except json.JSONDecodeError:
         return DEFAULT_CONFIG.copy()
 
+def encode_config(config):
+    """Serialises the config as compact single-line JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(config, option=orjson.OPT_APPEND_NEWLINE)
+    return json.dumps(config, separators=(',', ':')).encode() + b"\n"
+
 def save_config(config):
-    with open(CONFIG_FILE, 'w') as f:
-        json.dump(config, f, indent=2)
+    # Write a temp file and rename it over the config so a crash can't truncate it
+    tmp_file = CONFIG_FILE.with_name(CONFIG_FILE.name + ".tmp")
+    # Same 0o600 mode load_config creates the file with, so saving never widens it
+    fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with open(fd, 'wb') as f:
+        f.write(encode_config(config))
+    os.replace(tmp_file, CONFIG_FILE)
 
 # --- Server List Management ---
+_LIST_FILES = {"A": LIST_A_FILE, "B": LIST_B_FILE}
+
+def _resolve_list(name):
+    """Maps a list name to its file; anything other than A means list B."""
+    return _LIST_FILES.get(name.upper(), LIST_B_FILE)
+
 def get_active_list(config):
     """Returns list of servers from the active list file."""
-    list_file = LIST_A_FILE if config["active_list"] == "A" else LIST_B_FILE
+    list_file = _resolve_list(config["active_list"])
     if not list_file.exists():
         return []
-    servers = list_file.read_text().strip().splitlines()
-    return [s.strip() for s in servers if s.strip()]
+    raw = list_file.read_bytes().decode().split('\n')
+    return [s for s in (line.strip() for line in raw) if s]
 
 def update_list(list_name, servers):
     """Overwrites list A or B with new server entries."""
-    list_file = LIST_A_FILE if list_name.upper() == "A" else LIST_B_FILE
-    list_file.write_text("\n".join(servers) + "\n")
+    list_file = _resolve_list(list_name)
+    # Gather-write the encoded entries rather than building one joined string
+    nl = b"\n"
+    parts = [x for s in servers for x in (s.encode(), nl)]
+    # sysconf returns -1 when the limit is indeterminate; POSIX guarantees at least 16
+    iov_max = max(os.sysconf("SC_IOV_MAX"), 16)
+    fd = os.open(list_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        i = 0
+        while i < len(parts):
+            written = os.writev(fd, parts[i:i + iov_max])
+            # Skip the buffers that went out whole and trim a partially written one
+            while i < len(parts) and written >= len(parts[i]):
+                written -= len(parts[i])
+                i += 1
+            if written:
+                parts[i] = parts[i][written:]
+    finally:
+        os.close(fd)
 
 def search_list(list_name, pattern):
     """Returns servers matching pattern (case-insensitive substring)."""
-    list_file = LIST_A_FILE if list_name.upper() == "A" else LIST_B_FILE
+    list_file = _resolve_list(list_name)
     if not list_file.exists():
         return []
-    servers = list_file.read_text().strip().splitlines()
-    return [s for s in servers if pattern.lower() in s.lower()]
+    pat = pattern.lower()
+    # Stream line by line rather than holding the whole file and its split copy
+    with list_file.open('r', buffering=65536) as f:
+        return [s for s in (line.strip() for line in f) if s and pat in s.lower()]
 
 def find_replace_list(list_name, find_str, replace_str):
     """Replaces all occurrences of find_str with replace_str in the list."""
-    list_file = LIST_A_FILE if list_name.upper() == "A" else LIST_B_FILE
-    content = list_file.read_text()
-    new_content = content.replace(find_str, replace_str)
-    list_file.write_text(new_content)
-    return content != new_content
+    list_file = _resolve_list(list_name)
+    content = list_file.read_bytes()
+    new_content = content.replace(find_str.encode(), replace_str.encode())
+    if new_content == content:
+        return False
+    list_file.write_bytes(new_content)
+    return True
 
 # --- VPN Control ---
-def connect_to_server(server_id):
-    """Connects to a specific ProtonVPN server using CLI."""
+# Optional: drive ProtonVPN in-process instead of spawning the CLI per rotation.
+# Imported on first connect/disconnect so plain CLI commands don't pay for it.
+_pvpn_connection = None
+_pvpn_import_tried = False
+
+def _get_pvpn_connection():
+    """Returns protonvpn_cli.connection, or None if it can't be loaded."""
+    global _pvpn_connection, _pvpn_import_tried
+    if not _pvpn_import_tried:
+        _pvpn_import_tried = True
+        try:
+            from protonvpn_cli import connection
+            _pvpn_connection = connection
+        except Exception:
+            _pvpn_connection = None
+    return _pvpn_connection
+
+def _run_in_process(func, *args):
+    """Calls a protonvpn_cli function, capturing what it prints. Returns (ok, output)."""
+    out = io.StringIO()
     try:
-        result = run(["protonvpn", "connect", server_id], check=True, stdout=PIPE, stderr=PIPE)
+        with redirect_stdout(out), redirect_stderr(out):
+            func(*args)
+    except SystemExit as e:
+        # The library reports failures by exiting, sometimes with a message
+        if isinstance(e.code, str):
+            return False, out.getvalue() + e.code
+        return not e.code, out.getvalue()
+    except Exception as e:
+        # e.g. PermissionError when not root; report it like a failed CLI run
+        return False, out.getvalue() + str(e)
+    return True, out.getvalue()
+
+def connect_to_server(server_id):
+    """Connects to a specific ProtonVPN server, in-process when the library is available."""
+    pvpn_connection = _get_pvpn_connection()
+    if pvpn_connection is not None:
+        ok, output = _run_in_process(pvpn_connection.openvpn_connect, server_id, "udp")
+        if not ok:
+            return False, f"Failed to connect to {server_id}: {output}", None
+    else:
+        try:
+            result = run(["protonvpn", "connect", server_id], check=True, stdout=PIPE, stderr=PIPE)
+        except CalledProcessError as e:
+            return False, f"Failed to connect to {server_id}: {e.stderr.decode()}", None
         output = result.stdout.decode()
-        
-        # Extract server name from success message
-        # Format: "Connected to CH-HR#2 in Zagreb, Switzerland. Your new IP address is 178.218.167.211."
-        server_info = None
-        if "Connected to" in output:
-            # Get everything from "Connected to " to the next period
-            connected_part = output.split("Connected to ")[1]
-            server_info = connected_part.split(".")[0].strip()
-        
-        return True, output, server_info  # Return tuple with 3 elements now
-    except CalledProcessError as e:
-        return False, f"Failed to connect to {server_id}: {e.stderr.decode()}", None
+    
+    # Extract server name from success message
+    # Format: "Connected to CH-HR#2 in Zagreb, Switzerland. Your new IP address is 178.218.167.211."
+    server_info = None
+    if "Connected to" in output:
+        # Get everything from "Connected to " to the next period
+        connected_part = output.split("Connected to ")[1]
+        server_info = connected_part.split(".")[0].strip()
+    
+    return True, output, server_info  # Return tuple with 3 elements now
 
 def disconnect_vpn():
     """Disconnects from VPN."""
-    run(["protonvpn", "disconnect"], stdout=PIPE, stderr=PIPE)
+    pvpn_connection = _get_pvpn_connection()
+    if pvpn_connection is not None:
+        _run_in_process(pvpn_connection.disconnect, True)
+    else:
+        run(["protonvpn", "disconnect"], stdout=PIPE, stderr=PIPE)
 
 # --- Daemon Core ---
 class VPNRotatorDaemon:
@@ -112,36 +223,182 @@ class VPNRotatorDaemon:
         self.config = load_config()
         self.control_pipe = None
         self.pipe_fd = None
+        self._sig_r = self._sig_w = None
         self.shutdown = False
         self.paused = self.config.get("paused", False)
         self.current_connection = None
+        self._wait_deadline = None  # Monotonic time of the next switch while waiting
+        self._next_pause_log = 0.0
+        self._list_cache = {}
+        self._cfg_dirty = False
+        self._cfg_last_save = 0.0
+        self._cmd_table = {
+            "stop": self._cmd_stop,
+            "pause": self._cmd_pause,
+            "resume": self._cmd_resume,
+            "switch": self._cmd_switch,
+            "interval": self._cmd_interval,
+            "skip": self._cmd_skip,
+            "status": self._cmd_status,
+        }
+        # One long-lived raw fd, written in batches by a background thread
+        self._log_fd = os.open(LOG_FILE, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._log_q = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        self._dropped_logs = 0
+        self._lost_logs = 0  # Lines the worker failed to write
+        self._log_thread = threading.Thread(target=self._log_worker, daemon=True)
+        self._log_thread.start()
+
+    def _log(self, msg, flush=False):
+        """Queues a line for the log worker; never blocks the daemon."""
+        try:
+            self._log_q.put_nowait((time.time(), msg, flush))
+        except queue.Full:
+            self._dropped_logs += 1
+
+    def _log_worker(self):
+        """Drains the log queue in batches until it sees the None sentinel."""
+        next_flush = time.monotonic() + LOG_FLUSH_SECONDS
+        last_sec, stamp = None, b""
+        buf = bytearray()
+        pending = 0  # Lines in buf
+        while True:
+            try:
+                batch = [self._log_q.get(timeout=LOG_FLUSH_SECONDS)]
+            except queue.Empty:
+                batch = []
+            while batch and batch[-1] is not None and len(batch) < LOG_BATCH_SIZE:
+                try:
+                    batch.append(self._log_q.get_nowait())
+                except queue.Empty:
+                    break
+            done = bool(batch) and batch[-1] is None
+            if done:
+                batch.pop()
+            for ts, msg, _ in batch:
+                # Most lines in a batch share a second; format and encode it only once
+                sec = int(ts)
+                if sec != last_sec:
+                    last_sec = sec
+                    stamp = time.strftime("%Y-%m-%d %H:%M:%S: ", time.localtime(sec)).encode()
+                buf += stamp
+                buf += msg.encode('utf-8', 'replace')
+                buf += b"\n"
+            pending += len(batch)
+            now = time.monotonic()
+            if (done or len(buf) >= LOG_BUFFER_BYTES or now >= next_flush
+                    or any(flush for _, _, flush in batch)):
+                if not self._write_log(buf):
+                    # Keep draining so _log never backs up behind a dead worker
+                    self._lost_logs += pending
+                buf.clear()
+                pending = 0
+                next_flush = now + LOG_FLUSH_SECONDS
+            if done:
+                return
+
+    def _write_log(self, buf):
+        """Writes the whole buffer to the log fd, retrying short writes.
+        Returns False if the write failed."""
+        view = memoryview(buf)
+        try:
+            while view:
+                view = view[os.write(self._log_fd, view):]
+        except OSError:
+            return False
+        finally:
+            view.release()
+        return True
+
+    def close_log(self):
+        """Stops the log worker after it has written everything queued."""
+        if self._dropped_logs:
+            self._log(f"Dropped {self._dropped_logs} log lines (queue full)")
+        if self._lost_logs:
+            self._log(f"Lost {self._lost_logs} log lines (write errors)")
+        if self._log_thread.is_alive():
+            try:
+                self._log_q.put(None, timeout=LOG_CLOSE_TIMEOUT)
+            except queue.Full:
+                pass
+            self._log_thread.join(LOG_CLOSE_TIMEOUT)
+        os.close(self._log_fd)
+
+    def flush_config(self, force=False):
+        """Saves pending config changes, at most once per CONFIG_SAVE_SECONDS."""
+        if not self._cfg_dirty:
+            return
+        now = time.monotonic()
+        if not force and now - self._cfg_last_save < CONFIG_SAVE_SECONDS:
+            return
+        save_config(self.config)
+        self._cfg_dirty = False
+        self._cfg_last_save = now
+
+    def get_active_list(self):
+        """Returns the active list, re-parsing the file only when it changes."""
+        list_file = _resolve_list(self.config["active_list"])
+        try:
+            st = list_file.stat()
+        except FileNotFoundError:
+            return []
+        key = (list_file, st.st_mtime_ns, st.st_size)
+        servers = self._list_cache.get(key)
+        if servers is None:
+            servers = get_active_list(self.config)
+            self._list_cache[key] = servers
+            while len(self._list_cache) > LIST_CACHE_SIZE:
+                del self._list_cache[next(iter(self._list_cache))]
+        return servers
 
     def disconnect_vpn(self):
         """Disconnects from VPN and clears current connection info."""
-        run(["protonvpn", "disconnect"], stdout=PIPE, stderr=PIPE)
+        disconnect_vpn()
         self.current_connection = None
 
     def setup_control_pipe(self):
         """Creates and opens a named pipe for receiving commands."""
         if not os.path.exists(CONTROL_FILE):
             os.mkfifo(CONTROL_FILE)
-        # Open pipe once and keep it open
-        self.pipe_fd = os.open(CONTROL_FILE, os.O_RDONLY | os.O_NONBLOCK)
+        # Open pipe once and keep it open. O_RDWR keeps a writer attached, so the
+        # pipe never hits EOF between clients and writers never see EPIPE
+        self.pipe_fd = os.open(CONTROL_FILE, os.O_RDWR | os.O_NONBLOCK)
+        # Self-pipe the signal module writes to, so signals also wake select()
+        self._sig_r, self._sig_w = os.pipe()
+        os.set_blocking(self._sig_r, False)
+        os.set_blocking(self._sig_w, False)
+        signal.set_wakeup_fd(self._sig_w)
+
+    def wait_for_input(self, timeout):
+        """Sleeps until a command or signal arrives, or timeout passes.
+        Returns True if the control pipe has data to read."""
+        ready, _, _ = select.select([self.pipe_fd, self._sig_r], [], [], max(timeout, 0))
+        if self._sig_r in ready:
+            try:
+                os.read(self._sig_r, 64)
+            except BlockingIOError:
+                pass
+        return self.pipe_fd in ready
 
-    def read_command(self):
-        """Reads a single command from the control pipe (non-blocking)."""
+    def read_commands(self):
+        """Drains the control pipe and returns every queued command (non-blocking)."""
         if self.pipe_fd is None:
-            return None
-        try:
-            data = os.read(self.pipe_fd, 1024).decode('utf-8').strip()
-            return data if data else None
-        except BlockingIOError:
-            return None
-        except OSError as e:
-            # Pipe might have been closed on the other end
-            with open(LOG_FILE, 'a') as f:
-                f.write(f"{datetime.now()}: Error reading pipe: {str(e)}\n")
-            return None
+            return []
+        buf = b""
+        while True:
+            try:
+                data = os.read(self.pipe_fd, 4096)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                # Pipe might have been closed on the other end
+                self._log(f"Error reading pipe: {str(e)}")
+                break
+            if not data:
+                break
+            buf += data
+        cmds = [c.strip() for c in buf.split(b"\n") if c.strip()]
+        return [c.decode('utf-8', 'replace') for c in cmds]
 
     def process_command(self, cmd):
         """Processes commands from control pipe or signals."""
@@ -150,41 +407,50 @@ class VPNRotatorDaemon:
         parts = cmd.split()
         if not parts:
             return
+        handler = self._cmd_table.get(parts[0].lower())
+        if handler:
+            handler(parts[1:])
 
-        action = parts[0].lower()
-        if action == "stop":
-            self.shutdown = True
-            self.config["running"] = False
-            save_config(self.config)
-            self.disconnect_vpn()
-        elif action == "pause":
-            self.paused = True
-            self.config["paused"] = True
-            save_config(self.config)
-        elif action == "resume":
-            self.paused = False
-            self.config["paused"] = False
-            save_config(self.config)
-        elif action == "switch" and len(parts) > 1:
-            new_list = parts[1].upper()
-            if new_list in ["A", "B"]:
-                self.config["active_list"] = new_list
-                self.config["current_index"] = 0  # Reset to start of new list
-                save_config(self.config)
-        elif action == "interval" and len(parts) > 1:
-            try:
-                minutes = int(parts[1])
-                if 1 <= minutes <= 1440:  # Reasonable bounds
-                    self.config["switch_interval_minutes"] = minutes
-                    save_config(self.config)
-            except ValueError:
-                pass
-        elif action == "skip":
-            self.config["current_index"] = (self.config.get("current_index", 0) + 1)
-            save_config(self.config)
-            self.disconnect_vpn()
-        elif action == "status":
-            self.log_status()
+    def _cmd_stop(self, args):
+        self.shutdown = True
+        self.config["running"] = False
+        self._cfg_dirty = True
+        self.disconnect_vpn()
+
+    def _cmd_pause(self, args):
+        self.paused = True
+        self.config["paused"] = True
+        self._cfg_dirty = True
+
+    def _cmd_resume(self, args):
+        self.paused = False
+        self.config["paused"] = False
+        self._cfg_dirty = True
+
+    def _cmd_switch(self, args):
+        if args and args[0].upper() in ["A", "B"]:
+            self.config["active_list"] = args[0].upper()
+            self.config["current_index"] = 0  # Reset to start of new list
+            self._cfg_dirty = True
+
+    def _cmd_interval(self, args):
+        if not args:
+            return
+        try:
+            minutes = int(args[0])
+        except ValueError:
+            return
+        if 1 <= minutes <= 1440:  # Reasonable bounds
+            self.config["switch_interval_minutes"] = minutes
+            self._cfg_dirty = True
+
+    def _cmd_skip(self, args):
+        self.config["current_index"] = (self.config.get("current_index", 0) + 1)
+        self._cfg_dirty = True
+        self.disconnect_vpn()
+
+    def _cmd_status(self, args):
+        self.log_status()
 
     def log_status(self):
         status = "RUNNING" if self.config["running"] else "STOPPED"
@@ -192,14 +458,16 @@ class VPNRotatorDaemon:
         active_list = self.config["active_list"]
         interval = self.config["switch_interval_minutes"]
         idx = self.config["current_index"]
-        servers = get_active_list(self.config)
+        servers = self.get_active_list()
         current_server = self.current_connection if self.current_connection else "None"  # Use stored info
         
         log_msg = (f"[STATUS] Daemon: {status}, State: {paused}, "
                 f"Active List: {active_list}, Interval: {interval}min, "
                 f"Index: {idx}/{len(servers)}, Current VPN: {current_server}")
-        with open(LOG_FILE, 'a') as f:
-            f.write(f"{datetime.now()}: {log_msg}\n")
+        if self._wait_deadline is not None:
+            log_msg += f", Next switch in: {max(self._wait_deadline - time.monotonic(), 0):.0f}s"
+        # The CLI reads the last log line right after asking for status
+        self._log(log_msg, flush=True)
         print(log_msg)
 
     def run(self):
@@ -211,141 +479,141 @@ class VPNRotatorDaemon:
         signal.signal(signal.SIGINT, lambda s, f: self.stop())
         signal.signal(signal.SIGTERM, lambda s, f: self.stop())
 
-        with open(LOG_FILE, 'a') as log:
-            log.write(f"{datetime.now()}: Daemon started. Paused: {self.paused}, Active List: {self.config['active_list']}, Interval: {self.config['switch_interval_minutes']}min\n")
+        self._log(f"Daemon started. Paused: {self.paused}, Active List: {self.config['active_list']}, Interval: {self.config['switch_interval_minutes']}min")
 
-        while not self.shutdown:
-            try:
-                # Check for commands
-                cmd = self.read_command()
-                if cmd:
-                    with open(LOG_FILE, 'a') as log:
-                        log.write(f"{datetime.now()}: Received command: {cmd}\n")
-                    self.process_command(cmd)
-
-                if self.shutdown:
-                    with open(LOG_FILE, 'a') as log:
-                        log.write(f"{datetime.now()}: Shutdown requested\n")
-                    break
+        try:
+            while not self.shutdown:
+                try:
+                    # Check for commands
+                    for cmd in self.read_commands():
+                        self._log(f"Received command: {cmd}")
+                        self.process_command(cmd)
+                    self.flush_config()
+
+                    if self.shutdown:
+                        self._log("Shutdown requested")
+                        break
+
+                    if not self.paused:
+                        servers = self.get_active_list()
+                        if not servers:
+                            self._log(f"No servers in list {self.config['active_list']}")
+                            self.wait_for_input(10)
+                            continue
 
-                if not self.paused:
-                    servers = get_active_list(self.config)
-                    if not servers:
-                        with open(LOG_FILE, 'a') as log:
-                            log.write(f"{datetime.now()}: No servers in list {self.config['active_list']}\n")
-                        time.sleep(10)
-                        continue
-
-                    idx = self.config.get("current_index", 0) % len(servers)
-                    server = servers[idx]
-
-                    # Log connection attempt
-                    with open(LOG_FILE, 'a') as log:
-                        log.write(f"{datetime.now()}: Connecting to server {idx+1}/{len(servers)}: {server}\n")
-
-                    # Connect
-                    success, msg, server_info = connect_to_server(server)  # Unpack 3 values
-                    now = datetime.now()
-                    with open(LOG_FILE, 'a') as log:
-                        log.write(f"{now}: Connection {'SUCCESS' if success else 'FAILED'}: {msg[:100]}\n")
-
-                    if success:
-                        # Store the current connection info
-                        self.current_connection = server_info if server_info else server
-                        # ... rest of the success handling
-                    else:
-                        self.current_connection = None
-                        # ... rest of the failure handling
+                        idx = self.config.get("current_index", 0) % len(servers)
+                        server = servers[idx]
+
+                        # Log connection attempt
+                        self._log(f"Connecting to server {idx+1}/{len(servers)}: {server}")
 
-                    if success:
-                        # Wait for interval
-                        wait_start = datetime.now()
-                        interval_seconds = self.config["switch_interval_minutes"] * 60
+                        # Connect
+                        success, msg, server_info = connect_to_server(server)  # Unpack 3 values
+                        self._log(f"Connection {'SUCCESS' if success else 'FAILED'}: {msg[:100]}")
+
+                        if success:
+                            # Store the current connection info
+                            self.current_connection = server_info if server_info else server
+                            # ... rest of the success handling
+                        else:
+                            self.current_connection = None
+                            # ... rest of the failure handling
+
+                        if success:
+                            # Wait for interval
+                            start_monotonic = time.monotonic()
+                            interval_seconds = self.config["switch_interval_minutes"] * 60
+                            deadline = self._wait_deadline = start_monotonic + interval_seconds
                         
-                        with open(LOG_FILE, 'a') as log:
-                            log.write(f"{datetime.now()}: Connected. Waiting {interval_seconds} seconds until {wait_start + timedelta(seconds=interval_seconds)}\n")
+                            # Wall-clock time is only needed for this human-readable summary
+                            self._log(f"Connected. Waiting {interval_seconds} seconds until {(datetime.now() + timedelta(seconds=interval_seconds)).strftime('%Y-%m-%d %H:%M:%S')}")
                         
-                        # Wait loop
-                        elapsed = 0
-                        while elapsed < interval_seconds and not self.shutdown:
-                            time.sleep(5)  # Check every 5 seconds
-                            elapsed = (datetime.now() - wait_start).total_seconds()
-                            
-                            # Log progress every 30 seconds
-                            if int(elapsed) % 30 == 0:
-                                with open(LOG_FILE, 'a') as log:
-                                    log.write(f"{datetime.now()}: Waiting... {elapsed:.0f}/{interval_seconds}s elapsed\n")
+                            # Wait loop: one select up to the deadline; only commands,
+                            # signals or a pending config save wake us before it
+                            while not self.shutdown:
+                                self.flush_config()
+                                now = time.monotonic()
+                                if now >= deadline:
+                                    break
+                                timeout = deadline - now
+                                if self._cfg_dirty:
+                                    # Wake up again to write the debounced config
+                                    timeout = min(timeout, CONFIG_SAVE_SECONDS)
+                                if not self.wait_for_input(timeout):
+                                    continue
                             
-                            # Check for commands
-                            cmd = self.read_command()
-                            if cmd:
-                                with open(LOG_FILE, 'a') as log:
-                                    log.write(f"{datetime.now()}: Received command during wait: {cmd}\n")
-                                self.process_command(cmd)
+                                # Check for commands
+                                for cmd in self.read_commands():
+                                    self._log(f"Received command during wait: {cmd}")
+                                    self.process_command(cmd)
                                 if self.shutdown or self.paused:
-                                    with open(LOG_FILE, 'a') as log:
-                                        log.write(f"{datetime.now()}: Breaking wait loop due to command\n")
+                                    self._log("Breaking wait loop due to command")
                                     break
-
-                        # Check why we exited the loop
-                        if self.shutdown:
-                            with open(LOG_FILE, 'a') as log:
-                                log.write(f"{datetime.now()}: Shutdown during wait\n")
-                            break
-                        elif self.paused:
-                            with open(LOG_FILE, 'a') as log:
-                                log.write(f"{datetime.now()}: Paused during wait\n")
-                            # Don't disconnect, stay connected but paused
-                            continue
-                        else:
-                            # Time's up - disconnect and move to next
-                            with open(LOG_FILE, 'a') as log:
-                                log.write(f"{datetime.now()}: Interval complete ({elapsed:.1f}s). Disconnecting...\n")
+                            self._wait_deadline = None
+                            elapsed = time.monotonic() - start_monotonic
+
+                            # Check why we exited the loop
+                            if self.shutdown:
+                                self._log("Shutdown during wait")
+                                break
+                            elif self.paused:
+                                self._log("Paused during wait")
+                                # Don't disconnect, stay connected but paused
+                                continue
+                            else:
+                                # Time's up - disconnect and move to next
+                                self._log(f"Interval complete ({elapsed:.1f}s). Disconnecting...")
                             
-                            self.disconnect_vpn()
-                            time.sleep(2)  # Give time for disconnect
+                                self.disconnect_vpn()
+                                time.sleep(2)  # Give time for disconnect
                             
-                            # Update index
-                            self.config["current_index"] = (idx + 1) % len(servers)
-                            save_config(self.config)
+                                # Update index
+                                self.config["current_index"] = (idx + 1) % len(servers)
+                                self._cfg_dirty = True
                             
-                            with open(LOG_FILE, 'a') as log:
-                                log.write(f"{datetime.now()}: Moved to next server. New index: {self.config['current_index']}\n")
-                    else:
-                        # Connection failed - move to next server
-                        with open(LOG_FILE, 'a') as log:
-                            log.write(f"{datetime.now()}: Connection failed, moving to next server in 10s\n")
+                                self._log(f"Moved to next server. New index: {self.config['current_index']}")
+                        else:
+                            # Connection failed - move to next server
+                            self._log("Connection failed, moving to next server in 10s")
                         
-                        self.config["current_index"] = (idx + 1) % len(servers)
-                        save_config(self.config)
-                        time.sleep(10)
-                else:
-                    # Paused state
-                    if int(time.time()) % 30 == 0:  # Log every 30 seconds when paused
-                        with open(LOG_FILE, 'a') as log:
-                            log.write(f"{datetime.now()}: Daemon paused. Current VPN: {self.current_connection}\n")
-                    time.sleep(1)
+                            self.config["current_index"] = (idx + 1) % len(servers)
+                            self._cfg_dirty = True
+                            self.wait_for_input(10)
+                    else:
+                        # Paused state
+                        now = time.monotonic()
+                        if now >= self._next_pause_log:  # Log every 30 seconds when paused
+                            self._log(f"Daemon paused. Current VPN: {self.current_connection}")
+                            self._next_pause_log = now + PAUSE_LOG_SECONDS
+                        # Nothing to do until the next log line unless a command arrives
+                        timeout = self._next_pause_log - now
+                        if self._cfg_dirty:
+                            timeout = min(timeout, CONFIG_SAVE_SECONDS)
+                        self.wait_for_input(timeout)
                     
-            except Exception as e:
-                with open(LOG_FILE, 'a') as log:
-                    log.write(f"{datetime.now()}: ERROR in main loop: {str(e)}\n")
-                    import traceback
-                    log.write(traceback.format_exc() + "\n")
-                time.sleep(5)
-
-        # Cleanup at the end
-        self.config["running"] = False
-        save_config(self.config)
-        with open(LOG_FILE, 'a') as log:
-            log.write(f"{datetime.now()}: Daemon stopped\n")
+                except Exception as e:
+                    self._log(f"ERROR in main loop: {str(e)}\n{traceback.format_exc()}")
+                    time.sleep(5)
+        finally:
+            # Cleanup at the end
+            self.config["running"] = False
+            self._cfg_dirty = True
+            self.flush_config(force=True)
+            self._log("Daemon stopped")
+            self.close_log()
         
-        # Close pipe if open
-        if self.pipe_fd is not None:
-            os.close(self.pipe_fd)
-            self.pipe_fd = None
+            # Close pipe if open
+            if self.pipe_fd is not None:
+                os.close(self.pipe_fd)
+                self.pipe_fd = None
+            if self._sig_r is not None:
+                signal.set_wakeup_fd(-1)
+                os.close(self._sig_r)
+                os.close(self._sig_w)
+                self._sig_r = self._sig_w = None
             
-        if os.path.exists(PID_FILE):
-            os.remove(PID_FILE)
+            if os.path.exists(PID_FILE):
+                os.remove(PID_FILE)
 
     def stop(self):
         self.shutdown = True
@@ -357,22 +625,100 @@ def send_command(cmd):
         print("Daemon control pipe not found. Is the daemon running?")
         return False
     
-    # Try multiple times since pipe might be temporarily closed
-    for _ in range(3):
-        try:
-            with open(CONTROL_FILE, 'w', encoding='utf-8') as pipe:
-                pipe.write(cmd + "\n")
-            return True
-        except BrokenPipeError:
-            time.sleep(0.1)  # Short delay before retry
-            continue
-        except Exception as e:
+    data = (cmd + "\n").encode('utf-8')
+    try:
+        fd = os.open(CONTROL_FILE, os.O_WRONLY | os.O_NONBLOCK)
+    except OSError as e:
+        if e.errno == errno.ENXIO:
+            # The FIFO exists but nothing has it open for reading
+            print("Daemon is not reading the control pipe. Is the daemon running?")
+        else:
             print(f"Error sending command: {e}")
-            return False
-    
-    print("Failed to send command after multiple attempts.")
-    print("Try restarting the daemon: ./pvpn-rotator.py stop && ./pvpn-rotator.py start")
-    return False
+        return False
+    try:
+        try:
+            os.write(fd, data)
+        except BlockingIOError:
+            time.sleep(0.01)  # Pipe full; give the daemon a moment to drain it
+            os.write(fd, data)
+        return True
+    except OSError as e:
+        print(f"Error sending command: {e}")
+        return False
+    finally:
+        os.close(fd)
+
+def _cli_start(args):
+    # Run as daemon
+    daemon = VPNRotatorDaemon()
+    # Write PID file
+    with open(PID_FILE, 'w') as f:
+        f.write(str(os.getpid()))
+    daemon.run()
+
+def _cli_send(command):
+    """Returns a handler that forwards `command` and its args to the daemon."""
+    return lambda args: send_command(" ".join([command, *args]))
+
+def _cli_status(args):
+    if not send_command("status"):
+        return
+    time.sleep(0.5)  # Give daemon time to log
+    if LOG_FILE.exists():
+        with open(LOG_FILE, 'r') as f:
+            lines = f.readlines()
+            if lines:
+                print(lines[-1].strip())
+
+def _cli_list(args):
+    load_config()
+    servers = get_active_list({"active_list": args[0].upper()})
+    print(f"List {args[0].upper()} ({len(servers)} servers):")
+    for i, s in enumerate(servers):
+        print(f"  {i+1}. {s}")
+
+def _cli_search(args):
+    results = search_list(args[0], args[1])
+    print(f"Found {len(results)} matches:")
+    for r in results:
+        print(f"  {r}")
+
+def _cli_add(args):
+    list_name, server = args
+    with open(_resolve_list(list_name), 'a') as f:
+        f.write(server + "\n")
+    print(f"Added '{server}' to list {list_name.upper()}")
+
+def _cli_remove(args):
+    list_name, server = args
+    servers = _resolve_list(list_name).read_text().splitlines()
+    remaining = [s for s in servers if s != server]
+    if len(remaining) != len(servers):
+        update_list(list_name, remaining)
+        print(f"Removed '{server}' from list {list_name.upper()}")
+    else:
+        print(f"Server '{server}' not found in list {list_name.upper()}")
+
+def _cli_replace(args):
+    changed = find_replace_list(*args)
+    print(f"Find/replace {'performed' if changed else 'no changes'}")
+
+# command -> (expected len(sys.argv), handler taking sys.argv[2:])
+CLI_COMMANDS = {
+    "start": (2, _cli_start),
+    "stop": (2, _cli_send("stop")),
+    "pause": (2, _cli_send("pause")),
+    "resume": (2, _cli_send("resume")),
+    "skip": (2, _cli_send("skip")),
+    "status": (2, _cli_status),
+    "switch": (3, _cli_send("switch")),
+    "interval": (3, _cli_send("interval")),
+    "list": (3, _cli_list),
+    "search": (4, _cli_search),
+    "add": (4, _cli_add),
+    "remove": (4, _cli_remove),
+    "replace": (5, _cli_replace),
+}
 
 def cli_control():
     """Handles user commands from terminal."""
@@ -394,60 +740,9 @@ def cli_control():
         print("  replace <A|B> <find> <replace> - Find and replace")
         return
 
-    command = sys.argv[1].lower()
-
-    if command == "start":
-        # Run as daemon
-        daemon = VPNRotatorDaemon()
-        # Write PID file
-        with open(PID_FILE, 'w') as f:
-            f.write(str(os.getpid()))
-        daemon.run()
-    elif command in ["stop", "pause", "resume", "skip", "status"]:
-        send_command(command)
-        if command == "status":
-            time.sleep(0.5)  # Give daemon time to log
-            if LOG_FILE.exists():
-                with open(LOG_FILE, 'r') as f:
-                    lines = f.readlines()
-                    if lines:
-                        print(lines[-1].strip())
-    elif command == "switch" and len(sys.argv) == 3:
-        send_command(f"switch {sys.argv[2]}")
-    elif command == "interval" and len(sys.argv) == 3:
-        send_command(f"interval {sys.argv[2]}")
-    elif command == "list" and len(sys.argv) == 3:
-        config = load_config()
-        servers = get_active_list({"active_list": sys.argv[2].upper()})
-        print(f"List {sys.argv[2].upper()} ({len(servers)} servers):")
-        for i, s in enumerate(servers):
-            print(f"  {i+1}. {s}")
-    elif command == "search" and len(sys.argv) == 4:
-        results = search_list(sys.argv[2], sys.argv[3])
-        print(f"Found {len(results)} matches:")
-        for r in results:
-            print(f"  {r}")
-    elif command == "add" and len(sys.argv) == 4:
-        list_name = sys.argv[2]
-        server = sys.argv[3]
-        list_file = LIST_A_FILE if list_name.upper() == "A" else LIST_B_FILE
-        with open(list_file, 'a') as f:
-            f.write(server + "\n")
-        print(f"Added '{server}' to list {list_name.upper()}")
-    elif command == "remove" and len(sys.argv) == 4:
-        list_name = sys.argv[2]
-        server = sys.argv[3]
-        list_file = LIST_A_FILE if list_name.upper() == "A" else LIST_B_FILE
-        servers = list_file.read_text().strip().splitlines()
-        if server in servers:
-            servers.remove(server)
-            list_file.write_text("\n".join(servers) + "\n")
-            print(f"Removed '{server}' from list {list_name.upper()}")
-        else:
-            print(f"Server '{server}' not found in list {list_name.upper()}")
-    elif command == "replace" and len(sys.argv) == 5:
-        changed = find_replace_list(sys.argv[2], sys.argv[3], sys.argv[4])
-        print(f"Find/replace {'performed' if changed else 'no changes'}")
+    argc, handler = CLI_COMMANDS.get(sys.argv[1].lower(), (None, None))
+    if handler and len(sys.argv) == argc:
+        handler(sys.argv[2:])
 
 # --- Systemd Service Setup ---
 def create_systemd_service():